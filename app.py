@@ -1,46 +1,259 @@
-from flask import Flask, render_template, request, jsonify
+# Patch sockets before anything imports them so DB waits yield under gevent
+from gevent import monkey
+monkey.patch_all()
+
+from flask import Flask, render_template, request
 from flask_cors import CORS
+from flask_caching import Cache
+from flask_compress import Compress
+from datetime import datetime
+import hashlib
 import math
-import mysql.connector
+import orjson
+import re
+from mysql.connector import errors, pooling
 import os
+import time
 
 app = Flask(__name__)
 CORS(app)
+Compress(app)
+
+# Default TTL follows the scraper's cadence (15 min). SimpleCache is per worker
+# process, so workers can briefly disagree on ETags; point CACHE_TYPE at a shared
+# backend (e.g. RedisCache) to keep them in step.
+cache = Cache(app, config={
+    'CACHE_TYPE': os.getenv("CACHE_TYPE", "SimpleCache"),
+    'CACHE_DEFAULT_TIMEOUT': int(os.getenv("CACHE_DEFAULT_TIMEOUT", 900))
+})
 
 # ---------------------------
-# Database Connection
+# Database Connection (pooled)
 # ---------------------------
+# One pool per worker process; size it to the worker's request concurrency.
+db_pool = pooling.MySQLConnectionPool(
+    pool_name="partner_events",
+    pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+    host=os.getenv("MYSQLHOST", "gondola.proxy.rlwy.net"),
+    user=os.getenv("MYSQLUSER", "root"),
+    password=os.getenv("MYSQLPASSWORD", "OJxEuDPJwSUJAwEwhrWYKnUODpYWzyMZ"),
+    database=os.getenv("MYSQL_DATABASE", "railway"),
+    port=int(os.getenv("MYSQLPORT", 53349)),  # ✅ Added explicit port support
+    use_pure=True  # the C extension's sockets can't be patched by gevent
+)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+
 def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("MYSQLHOST", "gondola.proxy.rlwy.net"),
-        user=os.getenv("MYSQLUSER", "root"),
-        password=os.getenv("MYSQLPASSWORD", "OJxEuDPJwSUJAwEwhrWYKnUODpYWzyMZ"),
-        database=os.getenv("MYSQL_DATABASE", "railway"),
-        port=int(os.getenv("MYSQLPORT", 53349))  # ✅ Added explicit port support
+    # The pool raises instead of blocking when exhausted, and the server can run
+    # more requests at once than there are connections, so wait for one to free up.
+    # close() on a pooled connection returns it to the pool.
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    while True:
+        try:
+            return db_pool.get_connection()
+        except errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+
+@app.errorhandler(errors.PoolError)
+def db_pool_exhausted(e):
+    # Every connection stayed busy for DB_POOL_TIMEOUT; shed load instead of a 500
+    return "Service busy, please retry.", 503, {"Retry-After": "1"}
+
+# ---------------------------
+# HTTP caching
+# ---------------------------
+# Short shared TTL; the scraper only refreshes data every ~15 min
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+
+@app.after_request
+def set_cache_control(response):
+    if response.status_code in (200, 304) and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def matching_etag(etag):
+    """The If-None-Match tag equal to etag, ignoring Flask-Compress's ':gzip'/':br' suffix."""
+    return next((tag for tag in request.if_none_match if tag.split(":", 1)[0] == etag), None)
+
+# ---------------------------
+# JSON responses
+# ---------------------------
+def ojson(obj):
+    """Like jsonify, but encoded with orjson; naive datetimes are emitted as UTC ISO 8601."""
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC),
+        mimetype='application/json'
     )
 
+# ---------------------------
+# Full-text search helpers
+# ---------------------------
+# Matches innodb_ft_min_token_size; shorter terms aren't in the FULLTEXT index
+FT_MIN_TOKEN_SIZE = int(os.getenv("FT_MIN_TOKEN_SIZE", 3))
+FT_OPERATORS = re.compile(r'[+\-><()~*"@]')
+
+def search_filter(q):
+    """Return a (clause, params) pair matching q against title/description."""
+    terms = FT_OPERATORS.sub(" ", q).split()
+    if terms and all(len(t) >= FT_MIN_TOKEN_SIZE for t in terms):
+        # Every term required, each as a prefix match
+        q_token = " ".join(f"+{t}*" for t in terms)
+        return "MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)", [q_token]
+    # Too short for the FULLTEXT index: fall back to a substring scan
+    return "(title LIKE %s OR description LIKE %s)", [f"%{q}%", f"%{q}%"]
+
+# ---------------------------
+# Listing columns
+# ---------------------------
+# Only what the cards need; descriptions are trimmed to a preview
+LIST_COLUMNS = {
+    "id": "id",
+    "source": "source",
+    "category": "category",
+    "title": "title",
+    "description": "LEFT(description, 280) AS description",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "location": "location",
+    "register_link": "register_link",
+}
+LIST_COLS = ", ".join(LIST_COLUMNS.values())
+
+def select_columns(fields):
+    """Projection for a ?fields= list; id/start_date always kept for next_cursor."""
+    wanted = {f.strip() for f in fields.split(",")} & LIST_COLUMNS.keys()
+    if not wanted:
+        return LIST_COLS
+    wanted |= {"id", "start_date"}
+    return ", ".join(sql for name, sql in LIST_COLUMNS.items() if name in wanted)
+
+# ---------------------------
+# Paginated query helpers
+# ---------------------------
+def count_events(cursor, where_clause, params):
+    """Fresh COUNT(*) of the events matching where_clause."""
+    cursor.execute(f"SELECT COUNT(*) AS total FROM partner_events {where_clause}", tuple(params))
+    return cursor.fetchone()['total']
+
+def last_page(total, per_page):
+    return max(1, math.ceil(total / per_page))
+
+def fetch_page(cursor, where_clause, params, per_page, offset, columns=LIST_COLS):
+    """Fetch one page of events plus the total match count in a single query."""
+    query = f"""
+        SELECT {columns}, COUNT(*) OVER() AS _total FROM partner_events
+        {where_clause}
+        ORDER BY start_date DESC, id DESC
+        LIMIT %s OFFSET %s
+    """
+    cursor.execute(query, tuple(params + [per_page, offset]))
+    events = cursor.fetchall()
+
+    if events:
+        total = events[0]['_total']
+        for event in events:
+            del event['_total']
+    elif offset:
+        # Past the last page there are no rows to carry the total
+        total = count_events(cursor, where_clause, params)
+    else:
+        total = 0
+
+    return events, total
+
+def fetch_clamped_page(cursor, where_clause, params, per_page, page, cached_total, columns=LIST_COLS):
+    """fetch_page() for a requested page number, clamped to the last page that exists.
+
+    cached_total is total_events_count(), read by the caller before it took this
+    cursor's connection so that a cache miss doesn't need a second pooled one.
+    Returns (events, total, page), page being the one actually served.
+    """
+    offset = (page - 1) * per_page
+    events, total = [], None
+    # The cached count can trail a scrape, so it only lets us skip an OFFSET
+    # that is probably past the end; the clamp itself uses a fresh total.
+    if not offset or offset < cached_total:
+        events, total = fetch_page(cursor, where_clause, params, per_page, offset, columns)
+    if not events and offset:
+        if total is None:
+            total = count_events(cursor, where_clause, params)
+        page = min(page, last_page(total, per_page))
+        events, total = fetch_page(cursor, where_clause, params, per_page, (page - 1) * per_page, columns)
+    return events, total, page
+
+def fetch_events(cursor, where_clause, params, per_page, offset=0, columns=LIST_COLS):
+    """Fetch one page of events without counting the matches."""
+    query = f"""
+        SELECT {columns} FROM partner_events
+        {where_clause}
+        ORDER BY start_date DESC, id DESC
+        LIMIT %s OFFSET %s
+    """
+    cursor.execute(query, tuple(params + [per_page, offset]))
+    return cursor.fetchall()
+
+# Drives the ETag, so keep it no older than the Cache-Control max-age
+TABLE_STATE_TTL = int(os.getenv("TABLE_STATE_TTL", 60))
+
+@cache.memoize(timeout=TABLE_STATE_TTL)
+def events_table_state():
+    """(row count, MAX(updated_at)) in one scan; O(rows) on InnoDB, so served from cache."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), MAX(updated_at) FROM partner_events")
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+def total_events_count():
+    """Unfiltered row count."""
+    return events_table_state()[0]
+
+def events_last_modified():
+    """Most recent insert/update time across partner_events."""
+    return events_table_state()[1]
+
+def next_cursor(events, per_page):
+    """Cursor for the page after `events`, or None on the last page."""
+    if len(events) < per_page or events[-1]['start_date'] is None:
+        return None
+    last = events[-1]
+    return {
+        "after_date": last['start_date'].strftime("%Y-%m-%d %H:%M:%S"),
+        "after_id": last['id']
+    }
+
 # ---------------------------
 # Main Web Route
 # ---------------------------
 @app.route('/')
 def index():
+    per_page = 16
+    page = max(1, request.args.get('page', 1, type=int))
+    offset = (page - 1) * per_page
+    total = total_events_count()
+
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor = conn.cursor(dictionary=True)
 
-    per_page = 16
-    page = request.args.get('page', 1, type=int)
+        # Skip an OFFSET past the cached end; clamp against a fresh count instead
+        events = fetch_events(cursor, "", [], per_page, offset) if not offset or offset < total else []
+        if not events and offset:
+            total = count_events(cursor, "", [])
+            page = min(page, last_page(total, per_page))
+            offset = (page - 1) * per_page
+            events = fetch_events(cursor, "", [], per_page, offset)
+    finally:
+        conn.close()
 
-    cursor.execute("SELECT COUNT(*) AS total FROM partner_events")
-    total = cursor.fetchone()['total']
+    # The cached count may trail a scrape; never report fewer rows than we served
+    total = max(total, offset + len(events))
     total_pages = math.ceil(total / per_page)
 
-    offset = (page - 1) * per_page
-    cursor.execute(
-        f"SELECT * FROM partner_events ORDER BY start_date DESC LIMIT {per_page} OFFSET {offset}"
-    )
-    events = cursor.fetchall()
-    conn.close()
-
     window_size = 10
     start_page = ((page - 1) // window_size) * window_size + 1
     end_page = min(start_page + window_size - 1, total_pages)
@@ -57,25 +270,41 @@ def index():
 # ---------------------------
 # API Endpoint (Filters + Pagination)
 # ---------------------------
+# Prefer cursor pagination (?after_date=...&after_id=... taken from the previous
+# response's next_cursor): its cost doesn't grow with depth like ?page= does.
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
     per_page = 16
-    page = request.args.get('page', 1, type=int)
-    offset = (page - 1) * per_page
+    page = max(1, request.args.get('page', 1, type=int))
+
+    after_id = request.args.get('after_id', type=int)
+    after_date = request.args.get('after_date', type=datetime.fromisoformat)
+    use_cursor = after_id is not None and after_date is not None
 
     q = request.args.get('q', '', type=str).strip()
     source = request.args.get('source', '', type=str).strip()
     category = request.args.get('category', '', type=str).strip()
+    columns = select_columns(request.args.get('fields', '', type=str))
+
+    # Same table state + same request -> same body, so repeat polls can 304
+    last_modified = events_last_modified()
+    cached_total = total_events_count()
+    etag = hashlib.md5(
+        f"{last_modified}:{cached_total}:{q}:{source}:{category}:{page}:{after_date}:{after_id}:{columns}".encode()
+    ).hexdigest()
+    cached_etag = matching_etag(etag)
+    if cached_etag:
+        response = app.response_class(status=304)
+        response.set_etag(cached_etag)
+        return response
 
     filters = []
     params = []
 
     if q:
-        filters.append("(title LIKE %s OR description LIKE %s)")
-        params.extend([f"%{q}%", f"%{q}%"])
+        clause, clause_params = search_filter(q)
+        filters.append(clause)
+        params.extend(clause_params)
     if source:
         filters.append("source = %s")
         params.append(source)
@@ -83,44 +312,64 @@ def get_events():
         filters.append("category = %s")
         params.append(category)
 
+    if use_cursor:
+        filters.append("(start_date, id) < (%s, %s)")
+        params.extend([after_date, after_id])
+
     where_clause = "WHERE " + " AND ".join(filters) if filters else ""
 
-    count_query = f"SELECT COUNT(*) AS total FROM partner_events {where_clause}"
-    cursor.execute(count_query, tuple(params))
-    total = cursor.fetchone()['total']
-    total_pages = math.ceil(total / per_page)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
 
-    query = f"""
-        SELECT * FROM partner_events
-        {where_clause}
-        ORDER BY start_date DESC
-        LIMIT %s OFFSET %s
-    """
-    cursor.execute(query, tuple(params + [per_page, offset]))
-    events = cursor.fetchall()
-    conn.close()
+        if use_cursor:
+            events = fetch_events(cursor, where_clause, params, per_page, columns=columns)
+        else:
+            events, total, page = fetch_clamped_page(cursor, where_clause, params, per_page, page, cached_total, columns)
+    finally:
+        conn.close()
+
+    filters_used = {
+        "q": q,
+        "source": source,
+        "category": category
+    }
+
+    if use_cursor:
+        # Page numbers and totals are not computed in cursor mode
+        response = ojson({
+            "filters": filters_used,
+            "events": events,
+            "next_cursor": next_cursor(events, per_page)
+        })
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+
+    total_pages = math.ceil(total / per_page)
 
     window_size = 10
     start_page = ((page - 1) // window_size) * window_size + 1
     end_page = min(start_page + window_size - 1, total_pages)
 
-    return jsonify({
+    response = ojson({
         "page": page,
         "total_pages": total_pages,
         "total_events": total,
         "start_page": start_page,
         "end_page": end_page,
-        "filters": {
-            "q": q,
-            "source": source,
-            "category": category
-        },
-        "events": events
+        "filters": filters_used,
+        "events": events,
+        "next_cursor": next_cursor(events, per_page)
     })
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
 
 # ---------------------------
 # Run the App (✅ For Railway)
 # ---------------------------
+# Production runs under gunicorn + gevent (see Procfile); this is for local use.
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # Railway assigns a port dynamically
     app.run(host="0.0.0.0", port=port)
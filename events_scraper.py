@@ -22,10 +22,13 @@ Last updated: 2025-10-30
 import os
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.constants import ClientFlag
 import json
 import re
 import requests
 import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from html import unescape
 
@@ -48,7 +51,10 @@ def get_db_connection():
         user=os.getenv("MYSQLUSER", "root"),
         password=os.getenv("MYSQLPASSWORD", "OJxEuDPJwSUJAwEwhrWYKnUODpYWzyMZ"),
         database=os.getenv("MYSQL_DATABASE", "railway"),
-        port=int(os.getenv("MYSQLPORT", 53349))  # ✅ Added explicit port support
+        port=int(os.getenv("MYSQLPORT", 53349)),  # ✅ Added explicit port support
+        # save_to_db relies on an unchanged upsert row counting 0 affected rows,
+        # not 1 as it would if the server reported found rows instead
+        client_flags=[-ClientFlag.FOUND_ROWS]
     )
 
 
@@ -56,14 +62,36 @@ def get_db_connection():
 # ---------------------------
 # Helper: Clean HTML
 # ---------------------------
-def clean_html(raw_html: str) -> str:
-    """Remove HTML tags and unescape HTML entities from text."""
-    if not raw_html:
-        return ""
-    clean_text = re.sub(r"<[^>]+>", "", raw_html)  # remove HTML tags
-    clean_text = unescape(clean_text)  # convert &nbsp;, &amp;, etc.
-    clean_text = re.sub(r"\s+", " ", clean_text).strip()  # normalize spaces
-    return clean_text
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+
+
+def clean_html(descriptions: pd.Series) -> pd.Series:
+    """Remove HTML tags and unescape HTML entities, for a whole column at once."""
+    cleaned = descriptions[descriptions.notna()]
+    # Many descriptions are plain text; only run the tag regex where it can match
+    has_tags = cleaned.str.contains("<", regex=False)
+    cleaned = cleaned.where(~has_tags, cleaned[has_tags].str.replace(_TAG_RE, "", regex=True))  # remove HTML tags
+    cleaned = (
+        cleaned
+        .map(unescape)  # convert &nbsp;, &amp;, etc.
+        .str.replace(_WS_RE, " ", regex=True)  # normalize spaces
+        .str.strip()
+    )
+    return descriptions.where(descriptions.isna(), cleaned)
+
+
+# ---------------------------
+# Helper: Normalize dates
+# ---------------------------
+def normalize_dates(dates: pd.Series) -> pd.Series:
+    """Parse ISO 8601 API dates to naive UTC datetimes; anything else becomes None."""
+    parsed = pd.to_datetime(dates, errors="coerce", utc=True, format="ISO8601").dt.tz_localize(None)
+    return pd.Series(
+        [d.to_pydatetime() if pd.notna(d) else None for d in parsed],
+        index=dates.index,
+        dtype=object,
+    )
 
 
 # ---------------------------
@@ -83,18 +111,17 @@ def parse_uipath(json_data: dict) -> list:
     webinars = []
 
     def find_resource_data(obj):
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                if k == "resourceData" and isinstance(v, list):
-                    return v
-                found = find_resource_data(v)
-                if found:
-                    return found
-        elif isinstance(obj, list):
-            for item in obj:
-                found = find_resource_data(item)
-                if found:
+        # Iterative DFS; children pushed reversed so they're visited in document order
+        stack = deque([obj])
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                found = node.get("resourceData")
+                if isinstance(found, list) and found:
                     return found
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
         return None
 
     data = find_resource_data(json_data)
@@ -119,7 +146,7 @@ def parse_uipath(json_data: dict) -> list:
         webinars.append({
             "source": "UiPath",
             "title": item.get("title"),
-            "description": clean_html(item.get("teaserBody") or item.get("body")),
+            "description": item.get("teaserBody") or item.get("body") or "",  # cleaned in main()
             "start_date": item.get("date"),
             "end_date": None,
             "location": None,
@@ -182,7 +209,7 @@ def parse_aws(json_data: dict) -> list:
         events.append({
             "source": "AWS",
             "title": fields.get("title"),
-            "description": clean_html(fields.get("bodyBack") or fields.get("body")),
+            "description": fields.get("bodyBack") or fields.get("body") or "",  # cleaned in main()
             "start_date": item.get("dateCreated"),
             "end_date": item.get("dateUpdated"),
             "location": None,
@@ -198,8 +225,7 @@ def parse_aws(json_data: dict) -> list:
 # ---------------------------
 # Remove Duplicates
 # ---------------------------
-def remove_duplicates(events: list) -> list:
-    df = pd.DataFrame(events)
+def remove_duplicates(df: pd.DataFrame) -> list:
     before = len(df)
     df.drop_duplicates(subset=["title", "start_date", "source"], inplace=True)
     after = len(df)
@@ -230,48 +256,64 @@ def save_to_csv(events: list, base_filename: str):
 #----------------
 
 def save_to_db(events: list):
+    # NULL start_dates never collide on unique_event, so undated events would be
+    # inserted again on every run; they're left out of the DB (still in the CSV).
+    dated = [e for e in events if e.get("start_date") is not None]
+    if len(dated) < len(events):
+        print(f"⚠️ Skipping {len(events) - len(dated)} events without a usable start date.")
+    events = dated
+
     if not events:
         print("⚠️ No data to save to DB")
-        return 0  # return 0 inserted
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Count before inserting
-    cursor.execute("SELECT COUNT(*) FROM partner_events")
-    before_count = cursor.fetchone()[0]
+        return 0, 0  # return 0 inserted, 0 updated
 
+    # unique_event (source, title, start_date) dedups; re-scrapes refresh mutable fields
     insert_query = """
-    INSERT IGNORE INTO partner_events 
+    INSERT INTO partner_events 
     (source, category, title, description, start_date, end_date, location, register_link)
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        description = VALUES(description),
+        register_link = VALUES(register_link)
     """
 
-    for e in events:
-        cursor.execute(insert_query, (
-            e.get("source"),
-            e.get("category"),
-            e.get("title"),
-            e.get("description"),
-            e.get("start_date"),
-            e.get("end_date"),
-            e.get("location"),
-            e.get("register_link"),
-        ))
+    rows = [(
+        e.get("source"),
+        e.get("category"),
+        e.get("title"),
+        e.get("description"),
+        e.get("start_date"),
+        e.get("end_date"),
+        e.get("location"),
+        e.get("register_link"),
+    ) for e in events]
 
-    conn.commit()
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+
+        # New rows get ids above the current max, so this PK lookup (instead of
+        # a COUNT(*) scan of the whole table) is enough to count them afterwards
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM partner_events")
+        max_id_before = cursor.fetchone()[0]
 
-    # Count after inserting
-    cursor.execute("SELECT COUNT(*) FROM partner_events")
-    after_count = cursor.fetchone()[0]
+        # One multi-row INSERT instead of a round-trip per event. autocommit is off,
+        # so it runs in the connection's implicit transaction until commit().
+        cursor.executemany(insert_query, rows)
+        # MySQL affected rows: 1 per new event, 2 per refreshed one, 0 if unchanged
+        affected_count = cursor.rowcount
 
-    inserted_count = after_count - before_count
+        cursor.execute("SELECT COUNT(*) FROM partner_events WHERE id > %s", (max_id_before,))
+        inserted_count = cursor.fetchone()[0]
+        updated_count = (affected_count - inserted_count) // 2
+        conn.commit()
 
-    cursor.close()
-    conn.close()
+        cursor.close()
+    finally:
+        conn.close()
 
-    print(f"🗄️ {inserted_count} new events inserted into DB (duplicates ignored).")
-    return inserted_count
+    print(f"🗄️ {inserted_count} new events inserted into DB, {updated_count} existing events updated.")
+    return inserted_count, updated_count
 
     
     
@@ -287,6 +329,7 @@ def write_log(log_data: dict):
         f"UiPath Events: {log_data.get('uipath', 0)}",
         f"Total (after duplicates): {log_data.get('total', 0)}",
         f"🆕 Newly inserted to DB: {log_data.get('inserted_total', 0)}",
+        f"♻️ Updated in DB: {log_data.get('updated_total', 0)}",
         "==============================="
     ]
     with open("scraper_log.txt", "a", encoding="utf-8") as log_file:
@@ -307,36 +350,46 @@ def main():
     all_events = []
     log_counts = {}
 
+    # --- Fetch all sources concurrently ---
+    urls = {"uipath": uipath_url, "nvidia": nvidia_url, "aws": aws_url}
+    with ThreadPoolExecutor(max_workers=len(urls)) as ex:
+        fut_map = {name: ex.submit(fetch_json, url) for name, url in urls.items()}
+    uipath_json = fut_map["uipath"].result()
+    nvidia_json = fut_map["nvidia"].result()
+    aws_json = fut_map["aws"].result()
+
     # --- UiPath ---
-    uipath_json = fetch_json(uipath_url)
     uipath_events = parse_uipath(uipath_json)
     log_counts["uipath"] = len(uipath_events)
     all_events.extend(uipath_events)
 
     # --- NVIDIA ---
-    nvidia_json = fetch_json(nvidia_url)
     nvidia_events = parse_nvidia(nvidia_json)
     log_counts["nvidia"] = len(nvidia_events)
     all_events.extend(nvidia_events)
 
     # --- AWS ---
-    aws_json = fetch_json(aws_url)
     aws_events = parse_aws(aws_json)
     log_counts["aws"] = len(aws_events)
     all_events.extend(aws_events)
 
-    # --- Remove duplicates ---
-    all_events = remove_duplicates(all_events)
+    # --- Clean descriptions/dates + remove duplicates (one DataFrame pass) ---
+    df = pd.DataFrame(all_events)
+    df["description"] = clean_html(df["description"])
+    # Raw API strings -> datetimes; unparseable dates become None instead of
+    # reaching MySQL, which rejects them under strict sql_mode
+    df["start_date"] = normalize_dates(df["start_date"])
+    df["end_date"] = normalize_dates(df["end_date"])
+    all_events = remove_duplicates(df)
     log_counts["total"] = len(all_events)
 
     # --- Save ---
     save_to_csv(all_events, "all_partner_events")
     
     # --- Save to database ---
-    save_to_db(all_events)
-    
-    inserted_total = save_to_db(all_events)
+    inserted_total, updated_total = save_to_db(all_events)
     log_counts["inserted_total"] = inserted_total
+    log_counts["updated_total"] = updated_total
 
 
     # --- Log summary ---
@@ -0,0 +1,4 @@
+-- Full-text index backing the `q` search on /api/events.
+-- One-time migration for databases created before it was added to partner_events.sql.
+ALTER TABLE `partner_events`
+  ADD FULLTEXT KEY `ft_title_desc` (`title`,`description`);
@@ -0,0 +1,6 @@
+-- Indexes serving ORDER BY start_date DESC, alone and behind the source/category filters.
+-- Check with EXPLAIN that the listing query no longer reports "Using filesort".
+ALTER TABLE `partner_events`
+  ADD KEY `idx_start_date` (`start_date` DESC),
+  ADD KEY `idx_source_start_date` (`source`,`start_date` DESC),
+  ADD KEY `idx_category_start_date` (`category`,`start_date` DESC);
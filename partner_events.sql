@@ -801,7 +801,11 @@ INSERT INTO `partner_events` (`id`, `source`, `category`, `title`, `description`
 --
 ALTER TABLE `partner_events`
   ADD PRIMARY KEY (`id`),
-  ADD UNIQUE KEY `unique_event` (`source`,`title`,`start_date`);
+  ADD UNIQUE KEY `unique_event` (`source`,`title`,`start_date`),
+  ADD KEY `idx_start_date` (`start_date` DESC),
+  ADD KEY `idx_source_start_date` (`source`,`start_date` DESC),
+  ADD KEY `idx_category_start_date` (`category`,`start_date` DESC),
+  ADD FULLTEXT KEY `ft_title_desc` (`title`,`description`);
 
 --
 -- AUTO_INCREMENT for dumped tables